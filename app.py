@@ -1,175 +1,469 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-from geopy.distance import geodesic
-import folium
-from folium import plugins
-import osmnx as ox
-import networkx as nx
+from pyproj import Geod
+try:
+    from sklearn.neighbors import BallTree
+except ImportError:  # fall back to brute-force haversine scans
+    BallTree = None
+import igraph as ig
 from datetime import datetime
-import json
-import matplotlib.pyplot as plt
-import plotly.express as px
-import os
+import orjson
+import hashlib
+import pickle
+import tempfile
+import threading
 import time
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+try:
+    import fcntl
+except ImportError:  # Windows: first-run downloads are not serialized
+    fcntl = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, which also handles NumPy values"""
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
-# Create temp directory for files
-os.makedirs('temp', exist_ok=True)
-
-# Load and prepare the store data
-stores_df = pd.read_csv('dataset of 50 stores.csv')
-
-# Cleanup function for temporary files
-@app.before_request
-def cleanup_temp_files():
-    temp_dir = 'temp'
-    if os.path.exists(temp_dir):
-        for file in os.listdir(temp_dir):
-            file_path = os.path.join(temp_dir, file)
-            try:
-                if os.path.isfile(file_path) and file.endswith('.html'):
-                    # Delete files older than 1 hour
-                    if os.path.getmtime(file_path) < time.time() - 3600:
-                        os.remove(file_path)
-            except Exception as e:
-                print(f"Error cleaning up temp files: {e}")
+# Road networks are pickled here so they survive restarts
+os.makedirs('cache', exist_ok=True)
+
+# Store data file; loaded once into StoreLocator's column arrays
+STORES_CSV = 'dataset of 50 stores.csv'
+# Only the columns StoreLocator reads, with explicit types so pandas skips
+# type inference; contact numbers are left to inference to keep them ints
+STORES_DTYPES = {
+    'Store Name': str,
+    'Address': str,
+    'Latitude': np.float64,
+    'Longitude': np.float64,
+    'Product Categories': str,
+}
+STORES_COLUMNS = [*STORES_DTYPES, 'Contact Number']
+
+# Bump when the way road graphs are built changes, so stale pickles in
+# cache/ are not reused
+GRAPH_CACHE_VERSION = 3
+
+# Route endpoints farther than this from any road node are outside the
+# area the graph covers; snapping them would draw a misleading route
+MAX_SNAP_METERS = 500
+
+# Mean Earth radius used for haversine distances
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS84 ellipsoid for exact (C-level) geodesic distances
+_GEOD = Geod(ellps='WGS84')
+
+# Traffic multiplier per hour of day: peak 8-10 and 17-19, off-peak 23-4
+_TRAFFIC = np.ones(24)
+_TRAFFIC[[8, 9, 10, 17, 18, 19]] = 1.5
+_TRAFFIC[[23, 0, 1, 2, 3, 4]] = 0.8
+
+def estimate_delivery_times(distances_km, hour):
+    """Delivery minutes for an array of distances at the given hour"""
+    # 5 mins base + 2 mins per km, scaled by time-of-day traffic
+    return np.rint((5.0 + 2.0 * np.asarray(distances_km, dtype=np.float64))
+                   * _TRAFFIC[hour]).astype(np.int64)
+
+def _haversine(lat, lon, lats, lons):
+    """Great-circle angles (radians) from one point to arrays of points"""
+    a = (np.sin((lats - lat) / 2.0) ** 2
+         + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2.0) ** 2)
+    return 2.0 * np.arcsin(np.sqrt(a))
+
+@contextmanager
+def _file_lock(path):
+    """Hold an exclusive cross-process lock on path for the with block"""
+    # lockf (POSIX record) locks belong to the process, so unlike flock a
+    # child forked mid-download does not inherit the parent's lock
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.lockf(f, fcntl.LOCK_EX)
+        yield
+
+def _snap_to_nodes(node_tree, node_rad, node_ids, lats, lons):
+    """Nearest node ids and snap distances (m) for a batch of coordinates"""
+    points = np.deg2rad(np.column_stack([lats, lons]))
+    if node_tree is not None:
+        angles, idx = node_tree.query(points, k=1)
+        angles, idx = angles[:, 0], idx[:, 0]
+    else:
+        all_angles = [_haversine(lat, lon, node_rad[:, 0], node_rad[:, 1])
+                      for lat, lon in points]
+        idx = np.array([np.argmin(a) for a in all_angles], dtype=np.int64)
+        angles = np.array([a[i] for a, i in zip(all_angles, idx)])
+    meters = angles * EARTH_RADIUS_KM * 1000.0
+    return [node_ids[i] for i in idx.tolist()], meters
+
+class NoPathError(Exception):
+    """No route connects two graph nodes"""
 
 class StoreLocator:
     def __init__(self, stores_dataframe):
-        self.stores_df = stores_dataframe
         self.network_graph = None
+
+        # Column arrays (SoA) so radius queries avoid per-row pandas access;
+        # the DataFrame itself is not kept
+        self._lat_deg = stores_dataframe['Latitude'].to_numpy(np.float64)
+        self._lon_deg = stores_dataframe['Longitude'].to_numpy(np.float64)
+        self._lat = np.deg2rad(self._lat_deg)
+        self._lon = np.deg2rad(self._lon_deg)
+        self._names = stores_dataframe['Store Name'].tolist()
+        self._addresses = stores_dataframe['Address'].tolist()
+        self._contacts = stores_dataframe['Contact Number'].tolist()
+        self._categories = stores_dataframe['Product Categories'].tolist()
+
+        # Catalog coordinates -> store id, to reuse precomputed graph nodes
+        self._store_index = {
+            coords: i for i, coords in
+            enumerate(zip(self._lat_deg.tolist(), self._lon_deg.tolist()))
+        }
+
+        # Road networks are centered on the catalog so every store is covered
+        self.stores_center = (float(self._lat_deg.mean()),
+                              float(self._lon_deg.mean()))
+
+        # Spatial index for O(log N) radius queries on the sphere
+        self._tree = None
+        if BallTree is not None:
+            self._tree = BallTree(np.column_stack([self._lat, self._lon]),
+                                  metric='haversine')
         
-    def initialize_graph(self, center_point, dist=20000):
+    def initialize_graph(self, center_point, dist=20000, consolidate_tolerance=15,
+                         allow_download=True):
         """Initialize road network graph for a given center point"""
         try:
-            self.network_graph = ox.graph_from_point(center_point, dist=dist, network_type="drive")
-            self.network_graph = ox.add_edge_speeds(self.network_graph)
-            self.network_graph = ox.add_edge_travel_times(self.network_graph)
+            # Snap the center to ~1km so nearby requests share a cached graph
+            center_point = (round(center_point[0], 2), round(center_point[1], 2))
+            key = hashlib.md5(
+                f'{center_point[0]}_{center_point[1]}_{dist}_{consolidate_tolerance}'
+                f'_v{GRAPH_CACHE_VERSION}'.encode()
+            ).hexdigest()
+            cache_path = os.path.join('cache', f'{key}.pkl')
+
+            G = None
+            if not os.path.exists(cache_path):
+                if not allow_download:
+                    return False
+                # One process downloads; others wait here, then read its pickle
+                with _file_lock(f'{cache_path}.lock'):
+                    if not os.path.exists(cache_path):
+                        G = self._download_graph(center_point, dist,
+                                                 consolidate_tolerance,
+                                                 cache_path)
+
+            if G is None:
+                with open(cache_path, 'rb') as f:
+                    G = pickle.load(f)
+
+            routing = self._build_routing_graph(G)
+
+            # Publish everything only once it is fully built; a failed load
+            # leaves the previous state untouched, and network_graph is set
+            # last because route requests test it for readiness
+            self.__dict__.update(routing)
+            # Fresh memo tables per graph so cached results never go stale
+            self.shortest_path = lru_cache(maxsize=4096)(self._shortest_path)
+            self.network_graph = G
             return True
         except Exception as e:
             print(f"Error initializing graph: {str(e)}")
             return False
 
+    def _download_graph(self, center_point, dist, consolidate_tolerance,
+                        cache_path):
+        """Download, annotate and consolidate a road network, caching it"""
+        # osmnx pulls in geopandas/shapely; only import it when a
+        # graph actually has to be downloaded
+        import osmnx as ox
+
+        G = ox.graph_from_point(center_point, dist=dist, network_type="drive")
+        G = ox.add_edge_speeds(G)
+        G = ox.add_edge_travel_times(G)
+
+        # Merge clustered intersection nodes so Dijkstra relaxes far
+        # fewer nodes/edges; consolidation needs a projected graph.
+        # Dead ends are kept so cul-de-sacs stay routable
+        G = ox.simplification.consolidate_intersections(
+            ox.project_graph(G),
+            tolerance=consolidate_tolerance,
+            rebuild_graph=True,
+            dead_ends=True
+        )
+        G = ox.project_graph(G, to_latlong=True)
+
+        # Consolidation extends edges into the merged nodes and
+        # rewrites their lengths, so travel times must follow
+        G = ox.add_edge_travel_times(G)
+
+        # Write to a unique temp file then rename, so a crash or a
+        # concurrent first run never leaves a partial pickle
+        fd, tmp_path = tempfile.mkstemp(dir='cache', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return G
+
+    def _build_routing_graph(self, G):
+        """Mirror the road network into igraph for compiled Dijkstra"""
+        node_ids = list(G.nodes)
+        node_index = {node: i for i, node in enumerate(node_ids)}
+
+        edges = list(G.edges(data=True))
+        graph = ig.Graph(
+            n=len(node_ids),
+            edges=[(node_index[u], node_index[v]) for u, v, _ in edges],
+            directed=True
+        )
+        graph.es['travel_time'] = [d['travel_time'] for _, _, d in edges]
+        graph.es['length'] = [d['length'] for _, _, d in edges]
+        edge_length = np.array(graph.es['length'], dtype=np.float64)
+        edge_time = np.array(graph.es['travel_time'], dtype=np.float64)
+
+        # Fastest edge between each node pair, matching what Dijkstra picks
+        edge_lookup = {}
+        edge_times = edge_time.tolist()
+        for e, pair in enumerate(graph.get_edgelist()):
+            best = edge_lookup.get(pair)
+            if best is None or edge_times[e] < edge_times[best]:
+                edge_lookup[pair] = e
+
+        # Node coordinates (lat, lon) and a tree to snap points onto the graph
+        node_coords = np.array(
+            [(G.nodes[node]['y'], G.nodes[node]['x']) for node in node_ids],
+            dtype=np.float64
+        )
+        node_rad = np.deg2rad(node_coords)
+        node_tree = None
+        if BallTree is not None:
+            node_tree = BallTree(node_rad, metric='haversine')
+
+        # Stores never move, so snap the whole catalog once per graph
+        store_nodes, store_snap_m = _snap_to_nodes(
+            node_tree, node_rad, node_ids, self._lat_deg, self._lon_deg)
+
+        return {
+            '_node_ids': node_ids,
+            '_node_index': node_index,
+            '_igraph': graph,
+            '_edge_length': edge_length,
+            '_edge_time': edge_time,
+            '_edge_lookup': edge_lookup,
+            '_node_coords': node_coords,
+            '_node_rad': node_rad,
+            '_node_tree': node_tree,
+            '_store_nodes': store_nodes,
+            '_store_snap_m': store_snap_m,
+        }
+
+    def _shortest_path(self, start_node, end_node, weight):
+        """Shortest path between two graph nodes as a tuple of node ids"""
+        vpath = self._igraph.get_shortest_paths(
+            self._node_index[start_node],
+            to=self._node_index[end_node],
+            weights=weight,
+            output='vpath'
+        )[0]
+        if not vpath:
+            raise NoPathError(
+                f"No path between {start_node} and {end_node}")
+        return tuple(self._node_ids[i] for i in vpath)
+
+    def nearest_nodes(self, lats, lons):
+        """Nearest graph node ids and snap distances (m) for coordinates"""
+        return _snap_to_nodes(self._node_tree, self._node_rad, self._node_ids,
+                              lats, lons)
+
+    def store_location(self, store_id):
+        """(lat, lon) of a catalog store by its id"""
+        if not 0 <= store_id < len(self._names):
+            raise ValueError(f"Unknown store_id: {store_id}")
+        return float(self._lat_deg[store_id]), float(self._lon_deg[store_id])
+
+    def store_node(self, lat, lon):
+        """Graph node and snap distance (m) for a store, cached for the catalog"""
+        store_id = self._store_index.get((lat, lon))
+        if store_id is not None:
+            return self._store_nodes[store_id], float(self._store_snap_m[store_id])
+        nodes, meters = self.nearest_nodes([lat], [lon])
+        return nodes[0], float(meters[0])
+
+    def _path_index(self, path):
+        """Row indices into the node tables for a path of node ids"""
+        return np.fromiter((self._node_index[node] for node in path),
+                           dtype=np.int64, count=len(path))
+
+    def route_coords(self, path):
+        """[lat, lon] pairs for a path of node ids"""
+        return self._node_coords[self._path_index(path)].tolist()
+
+    def route_totals(self, path):
+        """Total length (m) and travel time (s) along a path of node ids"""
+        idx = self._path_index(path).tolist()
+        edges = [self._edge_lookup[pair] for pair in zip(idx[:-1], idx[1:])]
+        return (float(self._edge_length[edges].sum()),
+                float(self._edge_time[edges].sum()))
+
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate direct distance between two points"""
-        return geodesic((lat1, lon1), (lat2, lon2)).kilometers
+        _, _, meters = _GEOD.inv(lon1, lat1, lon2, lat2)
+        return meters / 1000.0
 
     def estimate_delivery_time(self, distance, current_time=None):
         """Estimate delivery time based on distance and current time"""
         if current_time is None:
             current_time = datetime.now()
 
-        # Base time: 5 mins base + 2 mins per km
-        base_minutes = 5 + (distance * 2)
-        
-        # Apply traffic multiplier based on time of day
-        hour = current_time.hour
-        if hour in [8, 9, 10, 17, 18, 19]:  # Peak hours
-            multiplier = 1.5
-        elif hour in [23, 0, 1, 2, 3, 4]:   # Off-peak hours
-            multiplier = 0.8
-        else:                                # Normal hours
-            multiplier = 1.0
-            
-        return round(base_minutes * multiplier)
+        return int(estimate_delivery_times(distance, current_time.hour))
 
     def find_nearby_stores(self, lat, lon, radius=5):
         """Find stores within specified radius"""
+        query = np.deg2rad([[lat, lon]])
+
+        # Coarse pass: the sphere is within 0.5% of the ellipsoid, so a
+        # slightly wider haversine radius never misses a store
+        angle = radius * 1.01 / EARTH_RADIUS_KM
+        if self._tree is not None:
+            idx = self._tree.query_radius(query, r=angle)[0]
+        else:
+            idx = np.flatnonzero(
+                _haversine(query[0, 0], query[0, 1], self._lat, self._lon)
+                <= angle)
+
+        # Exact pass: WGS84 geodesic distances for the candidates only
+        _, _, meters = _GEOD.inv(np.full(len(idx), lon),
+                                 np.full(len(idx), lat),
+                                 self._lon_deg[idx],
+                                 self._lat_deg[idx])
+        distances = np.asarray(meters, dtype=np.float64) / 1000.0
+        inside = distances <= radius
+        idx, distances = idx[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        idx, distances = idx[order], distances[order]
+
+        # Delivery estimates for all survivors in one vector op
+        delivery_times = estimate_delivery_times(distances,
+                                                 datetime.now().hour)
+
         nearby_stores = []
-        
-        for _, store in self.stores_df.iterrows():
-            distance = self.calculate_distance(lat, lon, 
-                                            store['Latitude'], 
-                                            store['Longitude'])
-            
-            if distance <= radius:
-                delivery_time = self.estimate_delivery_time(distance)
-                nearby_stores.append({
-                    'store_name': store['Store Name'],
-                    'address': store['Address'],
-                    'contact': store['Contact Number'],
-                    'distance': round(distance, 2),
-                    'estimated_delivery_time': delivery_time,
-                    'product_categories': store['Product Categories'],
-                    'location': {
-                        'lat': store['Latitude'],
-                        'lon': store['Longitude']
-                    }
-                })
-        
-        return sorted(nearby_stores, key=lambda x: x['distance'])
-
-    def create_store_map(self, center_lat, center_lon, radius=5):
-        """Create an interactive map with store locations"""
-        # Create base map
-        m = folium.Map(location=[center_lat, center_lon], 
-                      zoom_start=13,
-                      tiles="cartodbpositron")
-        
-        # Add stores to map
-        nearby_stores = self.find_nearby_stores(center_lat, center_lon, radius)
-        
-        for store in nearby_stores:
-            # Prepare popup content
-            popup_content = f"""
-            <div style='width: 200px'>
-                <b>{store['store_name']}</b><br>
-                Address: {store['address']}<br>
-                Distance: {store['distance']} km<br>
-                Est. Delivery: {store['estimated_delivery_time']} mins<br>
-                Categories: {store['product_categories']}
-            </div>
-            """
-            
-            # Add store marker
-            folium.Marker(
-                location=[store['location']['lat'], store['location']['lon']],
-                popup=folium.Popup(popup_content, max_width=300),
-                icon=folium.Icon(color='red', icon='info-sign')
-            ).add_to(m)
-            
-            # Add line to show distance from center
-            folium.PolyLine(
-                locations=[[center_lat, center_lon], 
-                          [store['location']['lat'], store['location']['lon']]],
-                weight=2,
-                color='blue',
-                opacity=0.3
-            ).add_to(m)
-        
-        # Add current location marker
-        folium.Marker(
-            location=[center_lat, center_lon],
-            popup='Your Location',
-            icon=folium.Icon(color='green', icon='home')
-        ).add_to(m)
-        
-        # Add fullscreen option
-        plugins.Fullscreen().add_to(m)
-        
-        # Add layer control
-        folium.LayerControl().add_to(m)
-        
-        return m
+        for i, distance, delivery_time in zip(idx.tolist(), distances.tolist(),
+                                              delivery_times.tolist()):
+            nearby_stores.append({
+                'store_id': i,
+                'store_name': self._names[i],
+                'address': self._addresses[i],
+                'contact': self._contacts[i],
+                'distance': round(distance, 2),
+                'estimated_delivery_time': delivery_time,
+                'product_categories': self._categories[i],
+                'location': {
+                    'lat': float(self._lat_deg[i]),
+                    'lon': float(self._lon_deg[i])
+                }
+            })
+
+        return nearby_stores
+
+    def create_store_map(self, center_lat, center_lon, radius=5, nearby_stores=None):
+        """Create an interactive map page with store locations"""
+        if nearby_stores is None:
+            nearby_stores = self.find_nearby_stores(center_lat, center_lon, radius)
+
+        # One template render for the whole page instead of a Folium
+        # object (and Jinja render) per marker and line
+        return render_template('store_map.html',
+                               center_lat=center_lat,
+                               center_lon=center_lon,
+                               stores=nearby_stores)
+
+# Load the store data and initialize store locator
+store_locator = StoreLocator(
+    pd.read_csv(STORES_CSV, usecols=STORES_COLUMNS, dtype=STORES_DTYPES))
+
+# Load the road network at startup rather than on the first route request.
+# A graph already in cache/ is loaded right here, so a preloading gunicorn
+# master holds it before forking and workers share it copy-on-write. Only a
+# first-run download goes to the background, so endpoints that do not route
+# are served meanwhile.
+graph_ready = threading.Event()
+
+# How long a route request waits on the warm-up before answering 503
+GRAPH_WAIT_SECONDS = 2
+
+# Minimum gap between background reloads after a failed one
+GRAPH_RETRY_SECONDS = 60
+
+# At most one warm-up runs at a time; requests never load the graph inline
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+_warmup_failed_at = None
+
+def _warm_graph():
+    """Load the road network, then release waiting route requests"""
+    global _warmup_failed_at
+    try:
+        if not store_locator.initialize_graph(store_locator.stores_center):
+            _warmup_failed_at = time.monotonic()
+    finally:
+        graph_ready.set()
 
-# Initialize store locator
-store_locator = StoreLocator(stores_df)
+def _start_graph_warmup():
+    """Run the road network load in a daemon thread unless one is running"""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is not None and _warmup_thread.is_alive():
+            return
+        if (_warmup_failed_at is not None and
+                time.monotonic() - _warmup_failed_at < GRAPH_RETRY_SECONDS):
+            return
+        graph_ready.clear()
+        _warmup_thread = threading.Thread(target=_warm_graph,
+                                          name='graph-warmup', daemon=True)
+        _warmup_thread.start()
 
-def create_animated_route(G, path, color, weight=3):
-    """Create an animated route visualization"""
+def _restart_warmup_after_fork():
+    """Give a child forked mid-load its own warm-up thread"""
+    # Threads do not survive fork, so without this a gunicorn worker forked
+    # during a first-run download would never get a graph. The cache lock
+    # makes it wait for that download and then read the pickle.
+    global graph_ready, _warmup_lock, _warmup_thread
+    # The parent's lock may have been held by a thread that no longer exists
+    _warmup_lock = threading.Lock()
+    _warmup_thread = None
+    if not graph_ready.is_set():
+        graph_ready = threading.Event()
+        _start_graph_warmup()
+
+if store_locator.initialize_graph(store_locator.stores_center,
+                                  allow_download=False):
+    graph_ready.set()
+else:
+    _start_graph_warmup()
+os.register_at_fork(after_in_child=_restart_warmup_after_fork)
+
+def create_animated_route(route_coords, color, weight=3):
+    """Create an animated route visualization from (lat, lon) coordinates"""
     features = []
     timestamps = []
         
-    # Convert path nodes to coordinates
-    route_coords = [
-        (G.nodes[node]['y'], G.nodes[node]['x']) 
-        for node in path
-    ]
-        
     # Create features for each segment of the route
     for i in range(len(route_coords) - 1):
         segment = {
@@ -195,33 +489,18 @@ def create_animated_route(G, path, color, weight=3):
         
     return features
 
-def create_route_animation_data(G, path_time, path_length):
-    """Create animation data for route visualization"""
-    lst_start, lst_end = [], []
-    start_x, start_y = [], []
-    end_x, end_y = [], []
-    lst_length, lst_time = [], []
-    
-    # Process time-based path
-    for a, b in zip(path_time[:-1], path_time[1:]):
-        lst_start.append(a)
-        lst_end.append(b)
-        lst_length.append(round(G.edges[(a,b,0)]['length']))
-        lst_time.append(round(G.edges[(a,b,0)]['travel_time']))
-        start_x.append(G.nodes[a]['x'])
-        start_y.append(G.nodes[a]['y'])
-        end_x.append(G.nodes[b]['x'])
-        end_y.append(G.nodes[b]['y'])
-    
-    # Create DataFrame
-    df = pd.DataFrame(
-        list(zip(lst_start, lst_end, start_x, start_y, end_x, end_y, 
-                 lst_length, lst_time)),
-        columns=["start", "end", "start_x", "start_y", "end_x", "end_y",
-                "length", "travel_time"]
-    ).reset_index().rename(columns={"index": "id"})
-    
-    return df
+# Radius query results per ~11m location bucket, shared by every endpoint
+# that lists stores. The hour is in the key for the delivery estimates.
+# Callers must not mutate the returned list.
+@lru_cache(maxsize=1024)
+def _cached_nearby_stores(lat, lon, radius, hour):
+    """Nearby stores for a quantized location"""
+    return store_locator.find_nearby_stores(lat, lon, radius)
+
+def _nearby_stores(lat, lon, radius):
+    """Nearby stores through the shared cache"""
+    return _cached_nearby_stores(round(lat, 4), round(lon, 4), radius,
+                                 datetime.now().hour)
 
 @app.route('/api/stores/nearby', methods=['GET'])
 def get_nearby_stores():
@@ -231,7 +510,7 @@ def get_nearby_stores():
         lon = float(request.args.get('lon'))
         radius = float(request.args.get('radius', 5))
         
-        nearby_stores = store_locator.find_nearby_stores(lat, lon, radius)
+        nearby_stores = _nearby_stores(lat, lon, radius)
         
         return jsonify({
             'status': 'success',
@@ -243,6 +522,21 @@ def get_nearby_stores():
             'message': str(e)
         }), 400
 
+def _html_response(html_content):
+    """Wrap rendered HTML with validators so browsers can revalidate cheaply"""
+    response = Response(html_content, mimetype='text/html')
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    response.add_etag()
+    return response.make_conditional(request)
+
+# Rendered pages are memoized per ~100m location bucket. The hour is part of
+# the key because delivery estimates change with the traffic period.
+@lru_cache(maxsize=512)
+def _render_stores_map(lat, lon, radius, hour):
+    """Render the stores map page for a quantized location"""
+    return store_locator.create_store_map(
+        lat, lon, radius, nearby_stores=_nearby_stores(lat, lon, radius))
+
 @app.route('/api/stores/map', methods=['GET'])
 def get_stores_map():
     """Get HTML map with store locations"""
@@ -251,50 +545,21 @@ def get_stores_map():
         lon = float(request.args.get('lon'))
         radius = float(request.args.get('radius', 5))
         
-        store_map = store_locator.create_store_map(lat, lon, radius)
-        
-        # Create complete HTML content
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no" />
-            <title>Stores Map</title>
-            <style>
-                body {{
-                    margin: 0;
-                    padding: 0;
-                    width: 100vw;
-                    height: 100vh;
-                    overflow: hidden;
-                }}
-                #map {{
-                    width: 100%;
-                    height: 100%;
-                }}
-            </style>
-        </head>
-        <body>
-            {store_map.get_root().render()}
-            <script>
-                window.onload = function() {{
-                    setTimeout(function() {{
-                        window.dispatchEvent(new Event('resize'));
-                    }}, 1000);
-                }};
-            </script>
-        </body>
-        </html>
-        """
-        
-        # Save the HTML to a file
-        file_path = 'temp/stores_map.html'
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        # Return the file
-        return send_file(file_path, mimetype='text/html')
+        if request.args.get('nocache') == '1':
+            # Debugging aid: exact coordinates, a fresh radius query and
+            # render, and nothing stored by browsers or proxies either
+            response = Response(
+                store_locator.create_store_map(
+                    lat, lon, radius,
+                    nearby_stores=store_locator.find_nearby_stores(
+                        lat, lon, radius)),
+                mimetype='text/html')
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+
+        html_content = _render_stores_map(
+            round(lat, 3), round(lon, 3), radius, datetime.now().hour)
+        return _html_response(html_content)
         
     except Exception as e:
         return jsonify({
@@ -307,210 +572,62 @@ def get_store_route():
     try:
         user_lat = float(request.args.get('user_lat'))
         user_lon = float(request.args.get('user_lon'))
-        store_lat = float(request.args.get('store_lat'))
-        store_lon = float(request.args.get('store_lon'))
         
-        # Initialize graph if not already initialized
+        # Stores can be addressed by id (preferred) or by coordinates
+        store_id = request.args.get('store_id')
+        if store_id is not None:
+            store_lat, store_lon = store_locator.store_location(int(store_id))
+        else:
+            store_lat = float(request.args.get('store_lat'))
+            store_lon = float(request.args.get('store_lon'))
+        
+        # Never load the graph inline: after a failed load, (re)start the
+        # single background warm-up, wait briefly, then answer 503
+        if store_locator.network_graph is None:
+            _start_graph_warmup()
+            graph_ready.wait(timeout=GRAPH_WAIT_SECONDS)
         if store_locator.network_graph is None:
-            store_locator.initialize_graph((user_lat, user_lon))
+            return jsonify({
+                'status': 'error',
+                'message': ('Road network unavailable' if graph_ready.is_set()
+                            else 'Road network is still loading')
+            }), 503
         
-        # Get nearest nodes
-        start_node = ox.distance.nearest_nodes(
-            store_locator.network_graph, user_lon, user_lat)
-        end_node = ox.distance.nearest_nodes(
-            store_locator.network_graph, store_lon, store_lat)
+        # Snap the user to the graph; catalog stores have precomputed nodes
+        start_nodes, start_snap_m = store_locator.nearest_nodes([user_lat],
+                                                                [user_lon])
+        start_node = start_nodes[0]
+        end_node, end_snap_m = store_locator.store_node(store_lat, store_lon)
+
+        # The graph only covers the area around the store catalog
+        if max(float(start_snap_m[0]), end_snap_m) > MAX_SNAP_METERS:
+            return jsonify({
+                'status': 'error',
+                'message': 'Location is outside the routing coverage area'
+            }), 422
         
         try:
             # Calculate paths
-            path_time = nx.shortest_path(
-                store_locator.network_graph, 
+            path_time = store_locator.shortest_path(
                 start_node, 
                 end_node, 
-                weight='travel_time'
+                'travel_time'
             )
             
-            # Create animation data
-            lst_start, lst_end = [], []
-            start_x, start_y = [], []
-            end_x, end_y = [], []
-            lst_length, lst_time = [], []
-
-            for a, b in zip(path_time[:-1], path_time[1:]):
-                lst_start.append(a)
-                lst_end.append(b)
-                lst_length.append(round(store_locator.network_graph.edges[(a,b,0)]['length']))
-                lst_time.append(round(store_locator.network_graph.edges[(a,b,0)]['travel_time']))
-                start_x.append(store_locator.network_graph.nodes[a]['x'])
-                start_y.append(store_locator.network_graph.nodes[a]['y'])
-                end_x.append(store_locator.network_graph.nodes[b]['x'])
-                end_y.append(store_locator.network_graph.nodes[b]['y'])
-
-            df = pd.DataFrame(
-                list(zip(lst_start, lst_end, start_x, start_y, end_x, end_y, 
-                        lst_length, lst_time)),
-                columns=["start", "end", "start_x", "start_y",
-                        "end_x", "end_y", "length", "travel_time"]
-            ).reset_index().rename(columns={"index": "id"})
-
-            # Create animation using plotly
-            df_start = df[df["start"] == start_node]
-            df_end = df[df["end"] == end_node]
-
-            fig = px.scatter_mapbox(
-                data_frame=df, 
-                lon="start_x", 
-                lat="start_y",
-                zoom=15, 
-                width=1000, 
-                height=800,
-                animation_frame="id",
-                mapbox_style="carto-positron"
-            )
+            length_m, travel_time_s = store_locator.route_totals(path_time)
 
-            # Add driver marker
-            fig.data[0].marker = {"size": 12}
-
-            # Add start point
-            fig.add_trace(
-                px.scatter_mapbox(
-                    data_frame=df_start, 
-                    lon="start_x", 
-                    lat="start_y"
-                ).data[0]
-            )
-            fig.data[1].marker = {"size": 15, "color": "red"}
-
-            # Add end point
-            fig.add_trace(
-                px.scatter_mapbox(
-                    data_frame=df_end, 
-                    lon="start_x", 
-                    lat="start_y"
-                ).data[0]
+            # A single animated polyline: output grows with the number of
+            # route nodes, not with one full figure frame per edge
+            html_content = render_template(
+                'route_map.html',
+                route=store_locator.route_coords(path_time),
+                length_km=length_m / 1000.0,
+                travel_minutes=round(travel_time_s / 60)
             )
-            fig.data[2].marker = {"size": 15, "color": "green"}
-
-            # Add route
-            fig.add_trace(
-                px.line_mapbox(
-                    data_frame=df, 
-                    lon="start_x", 
-                    lat="start_y"
-                ).data[0]
-            )
-
-            # Update layout with slower animation settings
-            fig.update_layout(
-                showlegend=False,
-                margin={"r":0,"t":0,"l":0,"b":0},
-                autosize=True,
-                height=None,
-                updatemenus=[{
-                    "type": "buttons",
-                    "showactive": False,
-                    "y": 0,
-                    "x": 0,
-                    "xanchor": "left",
-                    "yanchor": "bottom",
-                    "buttons": [
-                        {
-                            "label": "Play",
-                            "method": "animate",
-                            "args": [
-                                None,
-                                {
-                                    "frame": {"duration": 1000, "redraw": True},
-                                    "fromcurrent": True,
-                                    "transition": {"duration": 800}
-                                }
-                            ]
-                        },
-                        {
-                            "label": "Pause",
-                            "method": "animate",
-                            "args": [
-                                [None],
-                                {
-                                    "frame": {"duration": 0, "redraw": False},
-                                    "mode": "immediate",
-                                    "transition": {"duration": 0}
-                                }
-                            ]
-                        }
-                    ]
-                }],
-                sliders=[{
-                    "currentvalue": {"prefix": "Step: "},
-                    "pad": {"t": 20},
-                    "len": 0.9,
-                    "x": 0.1,
-                    "xanchor": "left",
-                    "y": 0.02,
-                    "yanchor": "bottom",
-                    "steps": [
-                        {
-                            "args": [
-                                [k],
-                                {
-                                    "frame": {"duration": 1000, "redraw": True},
-                                    "transition": {"duration": 500},
-                                    "mode": "immediate"
-                                }
-                            ],
-                            "label": str(k),
-                            "method": "animate"
-                        } 
-                        for k in range(len(df))
-                    ]
-                }]
-            )
-
-            # Create complete HTML content
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no" />
-                <title>Route Map</title>
-                <style>
-                    body {{
-                        margin: 0;
-                        padding: 0;
-                        width: 100vw;
-                        height: 100vh;
-                        overflow: hidden;
-                    }}
-                    #map-container {{
-                        width: 100%;
-                        height: 100%;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div id="map-container">
-                    {fig.to_html(include_plotlyjs=True, full_html=False)}
-                </div>
-                <script>
-                    window.onload = function() {{
-                        setTimeout(function() {{
-                            window.dispatchEvent(new Event('resize'));
-                        }}, 1000);
-                    }};
-                </script>
-            </body>
-            </html>
-            """
-            
-            # Save the HTML to a file
-            file_path = 'temp/route_map.html'
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
             
-            # Return the file
-            return send_file(file_path, mimetype='text/html')
+            return _html_response(html_content)
 
-        except nx.NetworkXNoPath:
+        except NoPathError:
             return jsonify({
                 'status': 'error',
                 'message': 'No route found'
@@ -525,156 +642,25 @@ def get_store_route():
 @app.route('/api/stores/locations', methods=['GET'])
 def get_all_store_locations():
     """Get a map showing all stores in the given radius with colors based on distance"""
+    # Static Leaflet page; it fetches its data from locations.json
+    return app.send_static_file('locations.html')
+
+@app.route('/api/stores/locations.json', methods=['GET'])
+def get_all_store_locations_data():
+    """Get the stores shown on the locations map as JSON"""
     try:
         lat = float(request.args.get('lat'))
         lon = float(request.args.get('lon'))
         radius = float(request.args.get('radius', 10))
         
-        # Get nearby stores
-        nearby_stores = store_locator.find_nearby_stores(lat, lon, radius)
-        
-        # Create base map centered on user location
-        m = folium.Map(
-            location=[lat, lon],
-            zoom_start=12,
-            tiles="cartodbpositron"
-        )
-        
-        # Add user location marker
-        folium.Marker(
-            [lat, lon],
-            popup='Your Location',
-            icon=folium.Icon(color='green', icon='home')
-        ).add_to(m)
-        
-        # Add markers for each store with color coding based on distance
-        for store in nearby_stores:
-            # Color code based on distance
-            if store['distance'] <= 2:
-                color = 'red'  # Very close
-            elif store['distance'] <= 5:
-                color = 'orange'  # Moderate distance
-            else:
-                color = 'blue'  # Further away
-                
-            # Create detailed popup content with mobile-friendly styling
-            popup_content = f"""
-            <div style='width: 200px; font-size: 14px;'>
-                <h4 style='color: {color}; margin: 0 0 8px 0;'>{store['store_name']}</h4>
-                <b>Address:</b> {store['address']}<br>
-                <b>Distance:</b> {store['distance']} km<br>
-                <b>Est. Delivery:</b> {store['estimated_delivery_time']} mins<br>
-                <b>Contact:</b> {store['contact']}<br>
-                <b>Categories:</b> {store['product_categories']}<br>
-                <button onclick="window.location.href='/api/stores/route?user_lat={lat}&user_lon={lon}&store_lat={store['location']['lat']}&store_lon={store['location']['lon']}'" 
-                        style='margin-top: 8px; padding: 8px; width: 100%; background-color: #007bff; color: white; border: none; border-radius: 4px;'>
-                    Get Route
-                </button>
-            </div>
-            """
-            
-            # Add store marker
-            folium.Marker(
-                location=[store['location']['lat'], store['location']['lon']],
-                popup=folium.Popup(popup_content, max_width=300),
-                icon=folium.Icon(color=color, icon='info-sign'),
-                tooltip=f"{store['store_name']} ({store['distance']} km)"
-            ).add_to(m)
-            
-            # Add circle to show distance
-            folium.Circle(
-                location=[store['location']['lat'], store['location']['lon']],
-                radius=store['distance'] * 100,
-                color=color,
-                fill=True,
-                opacity=0.1
-            ).add_to(m)
-        
-        # Add distance circles from user location
-        for radius, color in [(2000, 'red'), (5000, 'orange'), (radius * 1000, 'blue')]:
-            folium.Circle(
-                location=[lat, lon],
-                radius=radius,
-                color=color,
-                fill=False,
-                weight=1,
-                dash_array='5, 5'
-            ).add_to(m)
+        nearby_stores = _nearby_stores(lat, lon, radius)
         
-        # Create mobile-friendly HTML content
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no" />
-            <title>Nearby Stores</title>
-            <style>
-                body {{
-                    margin: 0;
-                    padding: 0;
-                    width: 100vw;
-                    height: 100vh;
-                    overflow: hidden;
-                }}
-                #map {{
-                    width: 100%;
-                    height: 100%;
-                }}
-                .legend {{
-                    position: fixed;
-                    bottom: 20px;
-                    right: 20px;
-                    background: white;
-                    padding: 10px;
-                    border-radius: 5px;
-                    box-shadow: 0 1px 5px rgba(0,0,0,0.2);
-                    font-size: 12px;
-                    z-index: 1000;
-                }}
-                .info-box {{
-                    position: fixed;
-                    top: 20px;
-                    left: 20px;
-                    background: white;
-                    padding: 10px;
-                    border-radius: 5px;
-                    box-shadow: 0 1px 5px rgba(0,0,0,0.2);
-                    font-size: 12px;
-                    z-index: 1000;
-                }}
-            </style>
-        </head>
-        <body>
-            {m.get_root().render()}
-            <div class="legend">
-                <b>Distance Zones</b><br>
-                <span style="color: red;">●</span> &lt; 2 km<br>
-                <span style="color: orange;">●</span> 2-5 km<br>
-                <span style="color: blue;">●</span> &gt; 5 km
-            </div>
-            <div class="info-box">
-                <b>Search Radius:</b> {radius} km<br>
-                <b>Stores Found:</b> {len(nearby_stores)}
-            </div>
-            <script>
-                window.onload = function() {{
-                    setTimeout(function() {{
-                        window.dispatchEvent(new Event('resize'));
-                    }}, 1000);
-                }};
-            </script>
-        </body>
-        </html>
-        """
-        
-        # Save and return the file
-        file_path = 'temp/locations_map.html'
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        return send_file(file_path, mimetype='text/html')
-    
+        return jsonify({
+            'status': 'success',
+            'user': [lat, lon],
+            'radius': radius,
+            'stores': nearby_stores
+        })
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -682,4 +668,7 @@ def get_all_store_locations():
         }), 400
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080,debug=True)
+    # Development server only; run under gunicorn (see gunicorn.conf.py)
+    # for anything else
+    app.run(host='0.0.0.0', port=8080,
+            debug=os.environ.get('FLASK_DEBUG') == '1')
@@ -0,0 +1,19 @@
+# gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+
+bind = '0.0.0.0:8080'
+
+# Route computation is CPU bound, so scale with processes; threads cover
+# the time spent waiting on OSM downloads and clients
+workers = multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = 4
+
+# Load the app once in the master; forked workers share its store index
+# and, once cache/ holds the road graph, the graph too, copy-on-write. On a
+# first run the graph downloads in the background and each worker reads the
+# resulting pickle once it is written (see app.py)
+preload_app = True
+
+# The first graph build can take minutes
+timeout = 300
@@ -0,0 +1,13 @@
+// Base map tiles shared by every Leaflet page
+var BASE_TILES = {
+    url: 'https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png',
+    options: {
+        maxZoom: 20,
+        subdomains: 'abcd',
+        attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>'
+    }
+};
+
+function addBaseTiles(map) {
+    return L.tileLayer(BASE_TILES.url, BASE_TILES.options).addTo(map);
+}